@@ -0,0 +1,81 @@
+"""
+Backend parity check
+====================
+Serves random valid inputs through /api/predict_batch with every available
+inference backend and compares the fares with the sklearn pipeline
+(preprocessor, scaler if any, and model) on the same inputs. Run it in the
+backend directory next to the model artifacts:
+
+    python check_backends.py [n_rows]
+
+Exits with status 1 if an exact backend (lookup, compiled, forest, sklearn)
+serves a different fare. ONNX computes in float32 and is only reported.
+"""
+
+import sys
+
+import numpy as np
+
+import index
+
+# Backend name -> index.py global holding it (None: always available)
+BACKENDS = {
+    'lookup': 'fare_table',
+    'compiled': 'compiled_model',
+    'forest': 'flat_forest',
+    'onnx': 'onnx_session',
+    'sklearn': None
+}
+APPROXIMATE_BACKENDS = {'onnx'}
+
+
+def expected_fares(rows):
+    """
+    Fares from the sklearn pipeline itself, rounded like the API rounds them
+    """
+    X = index.apply_preprocessor(rows, index.preprocessor)
+    if index.scaler is not None:
+        X = index.scaler.transform(X)
+    return np.rint(np.maximum(index.model.predict(X), 0.0)).astype(np.int64)
+
+
+def served_fares(rows):
+    """
+    Fares served by /api/predict_batch with the currently loaded backend
+    """
+    client = index.app.test_client()
+    fares = []
+    for start in range(0, len(rows), index.MAX_BULK_ROWS):
+        response = client.post('/api/predict_batch', json=rows[start:start + index.MAX_BULK_ROWS])
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict_batch returned {response.status_code}: {response.get_json()}")
+        fares.extend(response.get_json()['predicted_fares'])
+    return np.array(fares, dtype=np.int64)
+
+
+def main(n_rows=3000):
+    rows = index.probe_inputs(n_rows, seed=42)
+    failed = False
+
+    for backend, attribute in BACKENDS.items():
+        index.MODEL_BACKEND = backend
+        if not index.load_pipeline():
+            print(f"{backend:>8}: pipeline failed to load")
+            failed = True
+            continue
+        if attribute is not None and getattr(index, attribute) is None:
+            print(f"{backend:>8}: not available, skipped")
+            continue
+
+        expected = expected_fares(rows)
+        mismatches = int(np.count_nonzero(served_fares(rows) != expected))
+        note = " (approximate)" if backend in APPROXIMATE_BACKENDS else ""
+        print(f"{backend:>8}: {mismatches} of {len(rows)} fares differ from sklearn{note}")
+        if mismatches and backend not in APPROXIMATE_BACKENDS:
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000))
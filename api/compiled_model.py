@@ -0,0 +1,55 @@
+"""
+Compiled tree ensemble
+======================
+The model compiled to a native shared library by tl2cgen (written by
+train_tagum_model.py as model.so). Every tree is generated as nested C
+comparisons, so predicting is one call into machine code instead of walking
+node arrays.
+"""
+
+import numpy as np
+
+try:
+    import tl2cgen
+except ImportError:  # tl2cgen is optional; the API falls back to the other backends
+    tl2cgen = None
+
+
+class CompiledModel:
+    """
+    tl2cgen predictor plus the input dtype its model was trained on
+    """
+
+    def __init__(self, predictor, dtype):
+        self.predictor = predictor
+        self.dtype = dtype
+
+    @classmethod
+    def load(cls, path, estimator):
+        """
+        Load a library compiled from the given estimator
+
+        Args:
+            path (str): Path to model.so
+            estimator: The fitted sklearn model the library was compiled from
+
+        Returns:
+            CompiledModel: Loaded model
+        """
+        # sklearn forests cast their input to float32 before comparing it with
+        # the thresholds, while boosting compares the raw float64 values. The
+        # compiled code has to see the same values to take the same branches.
+        dtype = np.float32 if hasattr(estimator, 'estimators_') else np.float64
+        return cls(tl2cgen.Predictor(path, nthread=1), dtype)
+
+    def predict(self, X):
+        """
+        Predict fares for a stack of feature rows
+
+        Args:
+            X (np.ndarray): Feature matrix of shape (n_samples, n_features)
+
+        Returns:
+            np.ndarray: Predicted fares of shape (n_samples,)
+        """
+        return self.predictor.predict(tl2cgen.DMatrix(np.asarray(X, dtype=self.dtype))).reshape(-1)
@@ -0,0 +1,75 @@
+"""
+Precomputed fare lookup table
+=============================
+The model's prediction for every categorical combination sampled on a fine
+distance grid (written by train_tagum_model.py as lookup.npz). Predicting is a
+dict lookup for the combination plus a linear interpolation along distance.
+"""
+
+import itertools
+
+import numpy as np
+
+# Categorical fields in the order of the table's leading axes
+TABLE_FIELDS = ['Fuel_Price', 'Time_of_Day', 'Weather', 'Vehicle_Type']
+
+
+class FareTable:
+    """
+    Fare predictions indexed by (category combination, distance step)
+    """
+
+    def __init__(self, fares, distance_step, categories):
+        # One row of fares per combination, one column per distance step
+        self.fares = fares.reshape(-1, fares.shape[-1])
+        self.distance_step = distance_step
+        self.combo_index = {
+            combo: index for index, combo in enumerate(itertools.product(*categories))
+        }
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a table written by train_tagum_model.py
+
+        Args:
+            path (str): Path to lookup.npz
+
+        Returns:
+            FareTable: Loaded table
+        """
+        with np.load(path, allow_pickle=False) as table:
+            return cls(
+                fares=table['fares'],
+                distance_step=float(table['distance_step']),
+                categories=[[str(value) for value in table[field]] for field in TABLE_FIELDS]
+            )
+
+    def predict_many(self, rows):
+        """
+        Predict fares for validated input rows
+
+        Args:
+            rows (list[dict]): Validated input data
+
+        Returns:
+            np.ndarray: Predicted fares of shape (len(rows),)
+        """
+        combos = np.fromiter(
+            (self.combo_index[tuple(data[field] for field in TABLE_FIELDS)] for data in rows),
+            dtype=np.intp, count=len(rows)
+        )
+        distances = np.fromiter(
+            (float(data['Distance_km']) for data in rows), dtype=np.float64, count=len(rows)
+        )
+
+        # Distances past the end of the grid use the last column; the forest
+        # has no splits beyond the training range so its prediction is flat there
+        last = self.fares.shape[1] - 1
+        position = np.minimum(distances / self.distance_step, last)
+        lower = np.minimum(position.astype(np.intp), last - 1)
+        weight = position - lower
+
+        left = self.fares[combos, lower]
+        right = self.fares[combos, lower + 1]
+        return left + (right - left) * weight
@@ -0,0 +1,151 @@
+"""
+Request validation and feature encoding for the fare prediction API
+===================================================================
+Kept free of Flask and I/O so it can be compiled to a C extension with
+mypyc (see Dockerfile). index.py imports it the same way either way.
+"""
+
+import math
+from typing import Any, Optional
+
+import numpy as np
+
+# Expected column order for the input
+EXPECTED_COLUMNS: list[str] = [
+    'Distance_km',
+    'Fuel_Price',
+    'Time_of_Day',
+    'Weather',
+    'Vehicle_Type'
+]
+
+# Valid categorical values (updated for new dataset with ₱ symbol)
+VALID_VALUES: dict[str, list[str]] = {
+    'Fuel_Price': ['₱20-29', '₱30-39', '₱40-49', '₱50-59', '₱60-69', '₱70-79', '₱80-89', '₱90-99', '₱100 & up'],
+    'Time_of_Day': ['Rush Hour Morning', 'Off-Peak', 'Rush Hour Evening'],
+    'Weather': ['Sunny', 'Rainy'],
+    'Vehicle_Type': ['Single Motor', 'Tricycle']
+}
+
+# Column layout of the preprocessor output the model was trained on:
+# [Fuel_Price (ordinal), Time_of_Day x3, Weather x2, Vehicle_Type x2 (one-hot), Distance_km]
+N_FEATURES: int = 9
+
+# Fuel_Price -> ordinal code
+_FUEL_MAP: dict[str, int] = {value: code for code, value in enumerate(VALID_VALUES['Fuel_Price'])}
+
+# One-hot categories -> column index (OneHotEncoder sorts categories alphabetically)
+_TOD_MAP: dict[str, int] = {'Off-Peak': 1, 'Rush Hour Evening': 2, 'Rush Hour Morning': 3}
+_WEATHER_MAP: dict[str, int] = {'Rainy': 4, 'Sunny': 5}
+_VEH_MAP: dict[str, int] = {'Single Motor': 6, 'Tricycle': 7}
+
+# The encoding tables double as the membership tests for validation:
+# one hash probe per field instead of a list scan
+_CATEGORY_MAPS: dict[str, dict[str, int]] = {
+    'Fuel_Price': _FUEL_MAP,
+    'Time_of_Day': _TOD_MAP,
+    'Weather': _WEATHER_MAP,
+    'Vehicle_Type': _VEH_MAP
+}
+
+
+def validate_input_data(data: dict[str, Any]) -> tuple[bool, Optional[str]]:
+    """
+    Validate incoming prediction request data
+    
+    Args:
+        data (dict): Request data from client
+        
+    Returns:
+        tuple: (is_valid (bool), error_message (str or None))
+    """
+    # Check if all required fields are present
+    for column in EXPECTED_COLUMNS:
+        if column not in data:
+            return False, f"Missing required field: {column}"
+    
+    # Validate Distance_km
+    try:
+        distance = float(data['Distance_km'])
+        if math.isnan(distance):
+            return False, "Distance_km must be a valid number"
+        if distance <= 0:
+            return False, "Distance must be greater than 0"
+        if distance > 100:  # Sanity check for Tagum City
+            return False, "Distance seems unrealistic (> 100 km for Tagum City)"
+    except (ValueError, TypeError):
+        return False, "Distance_km must be a valid number"
+    
+    # Validate categorical fields
+    for field, allowed in _CATEGORY_MAPS.items():
+        value = data[field]
+        if not isinstance(value, str) or value not in allowed:
+            return False, f"Invalid {field}: '{value}'. Must be one of: {', '.join(VALID_VALUES[field])}"
+    
+    return True, None
+
+
+def _scale(scaler: Any, X: np.ndarray) -> np.ndarray:
+    """
+    Apply a fitted scaler, or nothing when the model was trained unscaled
+    """
+    return X if scaler is None else scaler.transform(X)
+
+
+class ScaledEncoder:
+    """
+    Encodes validated input straight into the scaled feature layout
+    
+    StandardScaler works column by column, so the scaled value of every
+    categorical code is precomputed once by pushing probe rows through the
+    fitted scaler. Encoding a request is then a few table reads plus one
+    affine step for the distance, with no scaler.transform call per request.
+    Models trained without a scaler pass None and get the raw layout.
+    """
+    
+    def __init__(self, scaler: Any) -> None:
+        # Scaled value of each column when its raw value is 0 and when it is 1
+        zeros = _scale(scaler, np.zeros((1, N_FEATURES)))[0]
+        ones = _scale(scaler, np.ones((1, N_FEATURES)))[0]
+        
+        # Scaled value of the fuel column for every ordinal code
+        fuel_probe = np.zeros((len(_FUEL_MAP), N_FEATURES))
+        fuel_probe[:, 0] = np.arange(len(_FUEL_MAP))
+        fuel_scaled = _scale(scaler, fuel_probe)[:, 0]
+        
+        self.base_row: np.ndarray = zeros
+        self.fuel_values: dict[str, float] = {
+            value: float(fuel_scaled[code]) for value, code in _FUEL_MAP.items()
+        }
+        self.hot_values: np.ndarray = ones
+        
+        # Same arithmetic as StandardScaler.transform for the distance column
+        last = N_FEATURES - 1
+        self.distance_offset: float = 0.0
+        self.distance_scale: float = 1.0
+        if scaler is not None:
+            if scaler.with_mean:
+                self.distance_offset = float(scaler.mean_[last])
+            if scaler.with_std:
+                self.distance_scale = float(scaler.scale_[last])
+    
+    def encode(self, data: dict[str, Any]) -> np.ndarray:
+        """
+        Encode validated input data into a scaled feature row
+        
+        Args:
+            data (dict): Validated input data
+            
+        Returns:
+            np.ndarray: Scaled feature row of shape (N_FEATURES,)
+        """
+        # Kept as float64 so the tree splits see exactly what the
+        # training path (preprocessor + scaler) produced
+        row = self.base_row.copy()
+        row[0] = self.fuel_values[data['Fuel_Price']]
+        for column in (_TOD_MAP[data['Time_of_Day']],
+                       _WEATHER_MAP[data['Weather']],
+                       _VEH_MAP[data['Vehicle_Type']]):
+            row[column] = self.hot_values[column]
+        row[N_FEATURES - 1] = (float(data['Distance_km']) - self.distance_offset) / self.distance_scale
+        return row
@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for the Tagum Tricycle Fare Optimizer API
+
+Usage: gunicorn -c gunicorn.conf.py index:app
+"""
+
+import os
+
+# Hugging Face Space runs on port 7860 by default
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+
+# One process per core, each serving requests from a small thread pool
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, os.cpu_count() or 1)))
+worker_class = 'gthread'
+threads = 4
+
+# index.py gives onnxruntime one intra-op thread per core by default, which
+# with one worker per core would start cores x cores threads
+os.environ.setdefault('ONNX_THREADS', '1')
+
+# Import the app (and load the model) once in the master; forked workers
+# share the model memory copy-on-write instead of each loading it again
+preload_app = True
+
+# Recycle workers periodically to bound memory growth
+max_requests = 10000
+max_requests_jitter = 500
+
+timeout = 30
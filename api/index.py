@@ -2,73 +2,174 @@
 Tricycle Fare Optimizer - Flask Backend API (Updated for New Model)
 ===================================================================
 This Flask application provides a REST API endpoint for predicting tricycle fares
-using the new trained Random Forest model with preprocessor and scaler.
+using the new trained Random Forest model with preprocessor (and scaler, for
+models trained before feature scaling was dropped).
+When lookup.npz is present, fares are read from the precomputed table instead;
+otherwise, when model.so and tl2cgen are available, inference runs through the
+natively compiled model, else through the flattened NumPy forest for Random
+Forest models, else through ONNX Runtime (float32, approximate) when model.onnx
+and onnxruntime are available.
 """
 
 from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask.json.provider import JSONProvider
 import joblib
-import pandas as pd
+import orjson
 import numpy as np
+import sklearn
 import os
+import functools
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+import queue
+import random
+import threading
+import time
+import warnings
+
+from fast_validate import VALID_VALUES, validate_input_data, ScaledEncoder
+from forest import FlatForest
+from fare_table import FareTable
+from compiled_model import CompiledModel, tl2cgen
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime is optional; fall back to the sklearn model
+    ort = None
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # asgiref is only needed to serve through an ASGI server
+    WsgiToAsgi = None
+
+# Configure logging. The Docker image sets LOG_LEVEL=WARNING; per-request
+# details are logged at DEBUG with lazy %-formatting so they cost nothing
+# unless enabled.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+# Fraction of requests traced at INFO (method and URL)
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', 0.001))
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson for request parsing and responses
+    """
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype='application/json'
+        )
+
+
+# Requests are validated before they reach the model (finite distance, known
+# categories), so skip sklearn's per-call NaN/inf scan of the input
+sklearn.set_config(assume_finite=True)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# CORS headers for all routes (allows requests from frontend), built once
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Max-Age': '86400'
+}
+
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(_CORS_HEADERS)
+    return response
 
-# Enable CORS for all routes (allows requests from frontend)
-CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Global variables to store the loaded pipeline components
 model = None
 preprocessor = None
 scaler = None
 metadata = None
-
-# Expected column order for the input
-EXPECTED_COLUMNS = [
-    'Distance_km',
-    'Fuel_Price',
-    'Time_of_Day',
-    'Weather',
-    'Vehicle_Type'
-]
-
-# Valid categorical values (updated for new dataset with ₱ symbol)
-VALID_VALUES = {
-    'Fuel_Price': ['₱20-29', '₱30-39', '₱40-49', '₱50-59', '₱60-69', '₱70-79', '₱80-89', '₱90-99', '₱100 & up'],
-    'Time_of_Day': ['Rush Hour Morning', 'Off-Peak', 'Rush Hour Evening'],
-    'Weather': ['Sunny', 'Rainy'],
-    'Vehicle_Type': ['Single Motor', 'Tricycle']
-}
+encoder = None
+onnx_session = None
+onnx_input_name = None
+flat_forest = None
+fare_table = None
+compiled_model = None
+
+# Pipeline artifact paths, resolved once at import
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_PATH = os.path.join(BASE_DIR, 'pipeline.pkl')
+METADATA_JSON_PATH = os.path.join(BASE_DIR, 'model_metadata.json')
+# Separate pickles written by older versions of train_tagum_model.py
+MODEL_PATH = os.path.join(BASE_DIR, 'model.pkl')
+PREPROCESSOR_PATH = os.path.join(BASE_DIR, 'preprocessor.pkl')
+SCALER_PATH = os.path.join(BASE_DIR, 'scaler.pkl')
+METADATA_PATH = os.path.join(BASE_DIR, 'model_metadata.pkl')
+ONNX_PATH = os.path.join(BASE_DIR, 'model.onnx')
+LOOKUP_PATH = os.path.join(BASE_DIR, 'lookup.npz')
+COMPILED_PATH = os.path.join(BASE_DIR, 'model.so')
+
+# Inference backend: 'auto' uses the precomputed lookup.npz fare table when
+# present, then the tl2cgen-compiled model.so, then the flattened NumPy forest,
+# then model.onnx through onnxruntime when both are available, then the sklearn
+# model. ONNX runs in float32 and can round a fare differently from the model,
+# so it comes after the exact backends.
+# 'lookup', 'compiled', 'forest', 'onnx' and 'sklearn' select one explicitly.
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'auto')
+# gunicorn.conf.py sets this to 1 so its one-per-core workers don't each
+# start a thread per core
+ONNX_THREADS = int(os.environ.get('ONNX_THREADS', os.cpu_count() or 1))
+
+# Dynamic batching: concurrent /predict calls are coalesced into one
+# model.predict call of up to BATCH_MAX rows. The worker only waits (at most
+# BATCH_TIMEOUT_MS) for rows that other requests are still preparing; a lone
+# request is predicted right away. BATCH_MAX=1 disables batching.
+BATCH_MAX = int(os.environ.get('BATCH_MAX', 64))
+BATCH_TIMEOUT_MS = float(os.environ.get('BATCH_TIMEOUT_MS', 10))
+
+# Predictions are memoized per (distance rounded to 0.01 km, categories) tuple.
+# The frontend already sends distances with two decimals.
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 65536))
+
+# Upper bound on rows accepted by /api/predict_batch
+MAX_BULK_ROWS = 1000
+
+_batch_queue = queue.Queue()
+_batch_worker = None
+_batch_worker_lock = threading.Lock()
+# Requests that are encoding their row and have not queued it yet
+_batch_pending = 0
+_batch_pending_lock = threading.Lock()
 
 
 def load_pipeline():
     """
-    Load all pipeline components: model, preprocessor, scaler, and metadata
+    Load all pipeline components: model, preprocessor, metadata, and the
+    scaler when present (older models were trained on scaled features).
+    pipeline.pkl and model_metadata.json are preferred; the separate
+    pickles of older training runs are still accepted.
     Returns: True if successful, False otherwise
     """
-    global model, preprocessor, scaler, metadata
-    
-    base_dir = os.path.dirname(__file__)
-    
-    # Define paths
-    model_path = os.path.join(base_dir, 'model.pkl')
-    preprocessor_path = os.path.join(base_dir, 'preprocessor.pkl')
-    scaler_path = os.path.join(base_dir, 'scaler.pkl')
-    metadata_path = os.path.join(base_dir, 'model_metadata.pkl')
+    global model, preprocessor, scaler, metadata, encoder, onnx_session, onnx_input_name, flat_forest, fare_table, compiled_model
     
     # Check if all files exist
-    required_files = {
-        'Model': model_path,
-        'Preprocessor': preprocessor_path,
-        'Scaler': scaler_path,
-        'Metadata': metadata_path
-    }
+    use_pipeline = os.path.exists(PIPELINE_PATH)
+    if use_pipeline:
+        required_files = {'Pipeline': PIPELINE_PATH}
+    else:
+        required_files = {'Model': MODEL_PATH, 'Preprocessor': PREPROCESSOR_PATH}
+    use_json_metadata = os.path.exists(METADATA_JSON_PATH)
+    required_files['Metadata'] = METADATA_JSON_PATH if use_json_metadata else METADATA_PATH
     
     missing_files = []
     for name, path in required_files.items():
@@ -81,65 +182,427 @@ def load_pipeline():
         logger.error("Please run 'py train_tagum_model.py' first to generate the model files")
         return False
     
+    # Load all components into locals first and only publish them once every
+    # check has passed, so a failed load leaves model as None and the next
+    # request retries instead of serving a half-loaded pipeline
     try:
-        # Load all components
-        model = joblib.load(model_path)
-        logger.info("✅ Model loaded successfully")
+        if use_pipeline:
+            # One file holding the fitted preprocessor and model. Its arrays
+            # are memory-mapped like the separate pickles below; a pipeline
+            # saved with TAGUM_COMPRESS=1 cannot be mapped and is
+            # decompressed into memory instead.
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='mmap_mode .* compressed', category=UserWarning)
+                pipeline = joblib.load(PIPELINE_PATH, mmap_mode='r')
+            new_preprocessor = pipeline.named_steps['prep']
+            new_model = pipeline.named_steps['model']
+            logger.info("✅ Pipeline loaded successfully")
+        else:
+            # Load all components. mmap_mode='r' memory-maps the numpy arrays
+            # inside the pickles, so they are read from the page cache (shared
+            # between workers) instead of being copied into each process.
+            new_model = joblib.load(MODEL_PATH, mmap_mode='r')
+            logger.info("✅ Model loaded successfully")
+            
+            new_preprocessor = joblib.load(PREPROCESSOR_PATH, mmap_mode='r')
+            logger.info("✅ Preprocessor loaded successfully")
         
-        preprocessor = joblib.load(preprocessor_path)
-        logger.info("✅ Preprocessor loaded successfully")
+        # The forest was trained with verbose=1; don't report joblib
+        # progress to stderr on every predict call
+        if hasattr(new_model, 'verbose'):
+            new_model.verbose = 0
         
-        scaler = joblib.load(scaler_path)
-        logger.info("✅ Scaler loaded successfully")
+        if not use_pipeline and os.path.exists(SCALER_PATH):
+            new_scaler = joblib.load(SCALER_PATH, mmap_mode='r')
+            logger.info("✅ Scaler loaded successfully")
+        else:
+            new_scaler = None
+            logger.info("No scaler.pkl, model uses unscaled features")
         
-        metadata = joblib.load(metadata_path)
+        if use_json_metadata:
+            with open(METADATA_JSON_PATH, 'rb') as f:
+                new_metadata = orjson.loads(f.read())
+        else:
+            new_metadata = joblib.load(METADATA_PATH, mmap_mode='r')
         logger.info("✅ Metadata loaded successfully")
-        logger.info(f"   Model R² Score: {metadata['r2']:.4f}")
-        logger.info(f"   Model MAE: ₱{metadata['mae']:.2f}")
+        logger.info(f"   Model R² Score: {new_metadata['r2']:.4f}")
+        logger.info(f"   Model MAE: ₱{new_metadata['mae']:.2f}")
         
-        return True
+        new_encoder = ScaledEncoder(new_scaler)
+        if not check_encoder(new_encoder, new_preprocessor, new_scaler):
+            return False
+        
+        new_fare_table = load_fare_table(LOOKUP_PATH, new_model, new_encoder)
+        
+        new_compiled_model = (
+            load_compiled_model(COMPILED_PATH, new_model, new_encoder) if new_fare_table is None else None
+        )
+        
+        model_backend_chosen = new_fare_table is not None or new_compiled_model is not None
+        new_flat_forest = build_flat_forest(new_model) if not model_backend_chosen else None
+        
+        new_onnx_session = (
+            load_onnx_session(ONNX_PATH, new_model, new_encoder)
+            if not model_backend_chosen and new_flat_forest is None else None
+        )
+        
+        warm_up(new_model, new_encoder, new_fare_table, new_compiled_model, new_onnx_session, new_flat_forest)
         
     except Exception as e:
         logger.error(f"Error loading pipeline components: {str(e)}")
         return False
+    
+    model, preprocessor, scaler, metadata = new_model, new_preprocessor, new_scaler, new_metadata
+    encoder = new_encoder
+    fare_table = new_fare_table
+    compiled_model = new_compiled_model
+    flat_forest = new_flat_forest
+    onnx_session = new_onnx_session
+    if onnx_session is not None:
+        onnx_input_name = onnx_session.get_inputs()[0].name
+    
+    # Drop predictions made by a previously loaded model
+    _cached_predict.cache_clear()
+    
+    return True
 
 
-def validate_input_data(data):
+def apply_preprocessor(rows, column_transformer):
+    """
+    Run the fitted ColumnTransformer over input dicts without pandas by
+    applying each fitted transformer to its own block of columns
+    
+    Args:
+        rows (list[dict]): Validated input data
+        column_transformer: Fitted ColumnTransformer (the pipeline's preprocessor)
+        
+    Returns:
+        np.ndarray: Preprocessed rows in the model's feature layout
     """
-    Validate incoming prediction request data
+    columns = list(column_transformer.feature_names_in_)
+    raw = np.array([[data[column] for column in columns] for data in rows], dtype=object)
+    
+    blocks = []
+    with warnings.catch_warnings():
+        # The transformers were fitted on a DataFrame and warn about
+        # missing feature names when given a plain array
+        warnings.simplefilter('ignore', UserWarning)
+        # scikit-learn 1.5/1.6 warn that the remainder's column format will
+        # change; both formats are handled below
+        warnings.filterwarnings('ignore', message=r'\s*The format of the columns', category=FutureWarning)
+        for _, transformer, selected in column_transformer.transformers_:
+            if transformer == 'drop' or len(selected) == 0:
+                continue
+            # Named columns are looked up; scikit-learn 1.5 stores the
+            # remainder's columns as integer positions instead
+            block = raw[:, [
+                column if isinstance(column, (int, np.integer)) else columns.index(column)
+                for column in selected
+            ]]
+            if transformer != 'passthrough':
+                block = transformer.transform(block)
+            blocks.append(block.toarray() if hasattr(block, 'toarray') else block)
+    return np.hstack(blocks).astype(np.float64)
+
+
+def probe_inputs(n_probes, seed):
+    """
+    Random valid inputs for checking a backend against the loaded model
     
     Args:
-        data (dict): Request data from client
+        n_probes (int): Number of inputs
+        seed (int): Seed for the random generator
         
     Returns:
-        tuple: (is_valid (bool), error_message (str or None))
+        list[dict]: Inputs in the request format
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'Distance_km': round(float(rng.uniform(0.1, 20.0)), 2),
+            **{field: str(rng.choice(values)) for field, values in VALID_VALUES.items()}
+        }
+        for _ in range(n_probes)
+    ]
+
+
+def check_encoder(scaled_encoder, column_transformer, fitted_scaler, n_probes=10):
     """
-    # Check if all required fields are present
-    for column in EXPECTED_COLUMNS:
-        if column not in data:
-            return False, f"Missing required field: {column}"
+    Compare the fused encoder against preprocessor + scaler on random inputs
+    
+    Args:
+        scaled_encoder (ScaledEncoder): Encoder built from the loaded scaler (if any)
+        column_transformer: Fitted ColumnTransformer the encoder must reproduce
+        fitted_scaler: Fitted scaler applied after it, or None
+        n_probes (int): Number of random inputs to compare
+        
+    Returns:
+        bool: True if both paths produce identical rows
+    """
+    probes = probe_inputs(n_probes, seed=0)
+    expected = apply_preprocessor(probes, column_transformer)
+    if fitted_scaler is not None:
+        expected = fitted_scaler.transform(expected)
+    fused = np.vstack([scaled_encoder.encode(data) for data in probes])
+    if not np.array_equal(fused, expected):
+        logger.error("Fused encoder does not match preprocessor + scaler; "
+                     "the saved pipeline has an unexpected feature layout")
+        return False
+    return True
+
+
+def load_fare_table(lookup_path, estimator, scaled_encoder, n_probes=10):
+    """
+    Load the precomputed fare table if enabled, after checking that it
+    reproduces the loaded sklearn model (a lookup.npz left over from an
+    earlier training run is ignored)
+    
+    Args:
+        lookup_path (str): Path to lookup.npz
+        estimator: Loaded sklearn model
+        scaled_encoder (ScaledEncoder): Encoder for the model's input rows
+        n_probes (int): Number of random inputs to compare
+        
+    Returns:
+        FareTable or None: None means run the model
+    """
+    if MODEL_BACKEND not in ('auto', 'lookup'):
+        return None
+    if not os.path.exists(lookup_path):
+        if MODEL_BACKEND == 'lookup':
+            logger.warning("Lookup backend requested but lookup.npz is missing, "
+                           "falling back to the model")
+        return None
+    
+    try:
+        table = FareTable.load(lookup_path)
+        probes = probe_inputs(n_probes, seed=3)
+        expected = estimator.predict(np.vstack([scaled_encoder.encode(data) for data in probes]))
+        # The table stores float32 fares, so allow rounding drift but not a different model
+        if not np.allclose(table.predict_many(probes), expected, rtol=0, atol=1e-2):
+            logger.warning("lookup.npz does not match the loaded model, falling back to the model")
+            return None
+        logger.info(f"✅ Fare lookup table loaded ({table.fares.size} entries)")
+        return table
+    except Exception as e:
+        logger.warning(f"Could not load fare lookup table, falling back to the model: {str(e)}")
+        return None
+
+
+def load_compiled_model(lib_path, estimator, scaled_encoder, n_probes=10):
+    """
+    Load the tl2cgen-compiled model if enabled, after checking that it
+    reproduces the loaded sklearn model (a stale model.so is ignored)
+    
+    Args:
+        lib_path (str): Path to model.so
+        estimator: Loaded sklearn model
+        scaled_encoder (ScaledEncoder): Encoder for the model's input rows
+        n_probes (int): Number of random inputs to compare
+        
+    Returns:
+        CompiledModel or None: None means use the next backend
+    """
+    if MODEL_BACKEND not in ('auto', 'compiled'):
+        return None
+    if tl2cgen is None or not os.path.exists(lib_path):
+        if MODEL_BACKEND == 'compiled':
+            logger.warning("Compiled backend requested but tl2cgen or model.so is missing, "
+                           "falling back to the next backend")
+        return None
+    
+    try:
+        compiled = CompiledModel.load(lib_path, estimator)
+        probes = np.vstack([scaled_encoder.encode(data) for data in probe_inputs(n_probes, seed=1)])
+        if not np.allclose(compiled.predict(probes), estimator.predict(probes), rtol=0, atol=1e-6):
+            logger.warning("model.so does not match the loaded model, falling back to the next backend")
+            return None
+        logger.info("✅ Compiled model loaded successfully")
+        return compiled
+    except Exception as e:
+        logger.warning(f"Could not load compiled model, falling back to the next backend: {str(e)}")
+        return None
+
+
+def load_onnx_session(onnx_path, estimator, scaled_encoder, n_probes=10):
+    """
+    Create an onnxruntime session for the exported model if enabled, after
+    checking that it reproduces the loaded sklearn model (a model.onnx left
+    over from an earlier training run is ignored). ONNX runs in float32, so
+    a fare on a .5 boundary can still round differently from the model.
+    
+    Args:
+        onnx_path (str): Path to model.onnx
+        estimator: Loaded sklearn model
+        scaled_encoder (ScaledEncoder): Encoder for the model's input rows
+        n_probes (int): Number of random inputs to compare
+        
+    Returns:
+        onnxruntime.InferenceSession or None: None means use the sklearn model
+    """
+    if MODEL_BACKEND not in ('auto', 'onnx'):
+        return None
+    if ort is None or not os.path.exists(onnx_path):
+        if MODEL_BACKEND == 'onnx':
+            logger.warning("ONNX backend requested but onnxruntime or model.onnx is missing, "
+                           "falling back to the sklearn model")
+        return None
+    
+    try:
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = ONNX_THREADS
+        session = ort.InferenceSession(
+            onnx_path, sess_options=sess_options, providers=['CPUExecutionProvider']
+        )
+        probes = np.vstack([scaled_encoder.encode(data) for data in probe_inputs(n_probes, seed=2)])
+        predicted = session.run(None, {session.get_inputs()[0].name: probes.astype(np.float32)})[0].ravel()
+        # ONNX runs in float32, so allow rounding drift but not a different model
+        if not np.allclose(predicted, estimator.predict(probes), rtol=0, atol=1e-2):
+            logger.warning("model.onnx does not match the loaded model, falling back to sklearn")
+            return None
+        logger.info("✅ ONNX model loaded successfully")
+        return session
+    except Exception as e:
+        logger.warning(f"Could not load ONNX model, falling back to sklearn: {str(e)}")
+        return None
+
+
+def build_flat_forest(estimator):
+    """
+    Flatten a fitted random forest into NumPy node tables if enabled
+    
+    Args:
+        estimator: Loaded sklearn model
+        
+    Returns:
+        FlatForest or None: None means use estimator.predict
+    """
+    if MODEL_BACKEND not in ('auto', 'forest'):
+        return None
+    if not hasattr(estimator, 'estimators_'):
+        return None
     
-    # Validate Distance_km
     try:
-        distance = float(data['Distance_km'])
-        if distance <= 0:
-            return False, "Distance must be greater than 0"
-        if distance > 100:  # Sanity check for Tagum City
-            return False, "Distance seems unrealistic (> 100 km for Tagum City)"
-    except (ValueError, TypeError):
-        return False, "Distance_km must be a valid number"
+        forest = FlatForest.from_estimator(estimator)
+        logger.info(f"✅ Flattened forest built ({len(forest.value)} nodes, depth {forest.max_depth})")
+        return forest
+    except Exception as e:
+        logger.warning(f"Could not flatten the forest, falling back to the next backend: {str(e)}")
+        return None
+
+
+def predict_rows(X_scaled):
+    """
+    Run the model over a stack of scaled feature rows
+    
+    Args:
+        X_scaled (np.ndarray): Rows from ScaledEncoder of shape (n, N_FEATURES)
+        
+    Returns:
+        np.ndarray: Predicted fares of shape (n,)
+    """
+    logger.debug("Input shape=%s", X_scaled.shape)
     
-    # Validate categorical fields
-    for field, valid_values in VALID_VALUES.items():
-        if data[field] not in valid_values:
-            return False, f"Invalid {field}: '{data[field]}'. Must be one of: {', '.join(valid_values)}"
+    if compiled_model is not None:
+        return compiled_model.predict(X_scaled)
+    if flat_forest is not None:
+        return flat_forest.predict(X_scaled)
+    if onnx_session is not None:
+        return onnx_session.run(None, {onnx_input_name: X_scaled.astype(np.float32)})[0].ravel()
+    # Rows stay float64: the forest casts to float32 itself, but boosting
+    # models bin the raw float64 values
+    return model.predict(X_scaled)
+
+
+def warm_up(estimator, scaled_encoder, table, compiled, session, forest):
+    """
+    Run a synthetic batch through the chosen backend so the first real
+    request doesn't pay for lazy initialization and cold caches. Under
+    gunicorn's preload_app this happens once in the master before forking.
+    load_pipeline calls it before publishing the backend, so an error here
+    fails the load.
     
-    return True, None
+    Args:
+        estimator: Loaded sklearn model
+        scaled_encoder (ScaledEncoder): Encoder for the loaded pipeline
+        table, compiled, session, forest: The chosen backend (at most one is set)
+    """
+    start = time.perf_counter()
+    rows = [
+        {
+            'Distance_km': 1.0 + index,
+            **{field: values[index % len(values)] for field, values in VALID_VALUES.items()}
+        }
+        for index in range(8)
+    ]
+    if table is not None:
+        table.predict_many(rows)
+    else:
+        X_scaled = np.vstack([scaled_encoder.encode(data) for data in rows])
+        if compiled is not None:
+            compiled.predict(X_scaled)
+        elif forest is not None:
+            forest.predict(X_scaled)
+        elif session is not None:
+            session.run(None, {session.get_inputs()[0].name: X_scaled.astype(np.float32)})
+        else:
+            estimator.predict(X_scaled)
+    logger.info("warmup complete in %.2f ms", (time.perf_counter() - start) * 1000)
+
+
+def _batch_worker_loop():
+    """
+    Drain queued single-row requests and predict them as one stacked batch
+    """
+    while True:
+        batch = [_batch_queue.get()]
+        deadline = time.monotonic() + BATCH_TIMEOUT_MS / 1000.0
+        while len(batch) < BATCH_MAX:
+            try:
+                batch.append(_batch_queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # Queue is drained: wait only if another row is about to arrive
+            remaining = deadline - time.monotonic()
+            if _batch_pending == 0 or remaining <= 0:
+                break
+            try:
+                batch.append(_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            predictions = predict_rows(np.vstack([row for row, _, _ in batch]))
+            for (_, done, result), value in zip(batch, predictions):
+                result.append(value)
+                done.set()
+        except Exception as e:
+            for _, done, result in batch:
+                result.append(e)
+                done.set()
+
+
+def _ensure_batch_worker():
+    """
+    Start the micro-batching worker thread for this process if needed.
+    Checked per call so gunicorn workers forked after import get their own.
+    """
+    global _batch_worker
+    if _batch_worker is not None and _batch_worker.is_alive():
+        return
+    with _batch_worker_lock:
+        if _batch_worker is None or not _batch_worker.is_alive():
+            _batch_worker = threading.Thread(
+                target=_batch_worker_loop, name='predict-batcher', daemon=True
+            )
+            _batch_worker.start()
 
 
 def prepare_and_predict(data):
     """
-    Prepare input data and make prediction using the full pipeline
+    Prepare input data and make prediction using the full pipeline.
+    Concurrent calls are coalesced into a single model.predict batch.
     
     Args:
         data (dict): Validated input data
@@ -147,29 +610,93 @@ def prepare_and_predict(data):
     Returns:
         float: Predicted fare
     """
-    # Create DataFrame with correct column order
-    X_input = pd.DataFrame([data], columns=EXPECTED_COLUMNS)
+    global _batch_pending
     
-    # Ensure Distance_km is float
-    X_input['Distance_km'] = X_input['Distance_km'].astype(float)
+    # Table lookups are cheaper than a round trip through the batching thread
+    if fare_table is not None:
+        return float(fare_table.predict_many([data])[0])
     
-    logger.info(f"Input Array:\n{X_input}")
+    if BATCH_MAX <= 1:
+        return float(predict_rows(encoder.encode(data)[np.newaxis, :])[0])
     
-    # Step 1: Apply preprocessor (encoding)
-    # Note: If preprocessor was fitted with pandas, it might warn about feature names, 
-    # but usually works if order is correct.
-    X_processed = preprocessor.transform(X_input)
-    logger.info(f"After preprocessing: shape = {X_processed.shape}")
+    _ensure_batch_worker()
+    done = threading.Event()
+    result = []
+    with _batch_pending_lock:
+        _batch_pending += 1
+    try:
+        _batch_queue.put((encoder.encode(data), done, result))
+    finally:
+        with _batch_pending_lock:
+            _batch_pending -= 1
+    done.wait()
     
-    # Step 2: Apply scaler
-    X_scaled = scaler.transform(X_processed)
-    logger.info(f"After scaling: shape = {X_scaled.shape}")
+    if isinstance(result[0], Exception):
+        raise result[0]
+    return float(result[0])
+
+
+def model_distance(data):
+    """
+    Distance as passed to the model, rounded to the 0.01 km the prediction
+    cache is keyed on so /predict and /predict_batch see the same value.
+    Validation accepts any positive distance, so one that rounds to zero is
+    priced as 0.01 km instead of as a 0 km trip.
     
-    # Step 3: Make prediction
-    prediction = model.predict(X_scaled)
-    predicted_fare = float(prediction[0])
+    Args:
+        data (dict): Validated input data
+        
+    Returns:
+        float: Distance in km rounded to two decimals, at least 0.01
+    """
+    return max(round(float(data['Distance_km']), 2), 0.01)
+
+
+@functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _cached_predict(distance, fuel_price, time_of_day, weather, vehicle_type):
+    """
+    Memoized prepare_and_predict keyed by the input tuple
+    """
+    return prepare_and_predict({
+        'Distance_km': distance,
+        'Fuel_Price': fuel_price,
+        'Time_of_Day': time_of_day,
+        'Weather': weather,
+        'Vehicle_Type': vehicle_type
+    })
+
+
+def predict_fare(data):
+    """
+    Predict the fare for validated input data, serving repeats from the cache
     
-    return predicted_fare
+    Args:
+        data (dict): Validated input data
+        
+    Returns:
+        float: Predicted fare
+    """
+    return _cached_predict(
+        model_distance(data),
+        data['Fuel_Price'],
+        data['Time_of_Day'],
+        data['Weather'],
+        data['Vehicle_Type']
+    )
+
+
+def ensure_pipeline_loaded():
+    """
+    Load the pipeline on first use
+    Returns: True if the pipeline is available, False otherwise
+    """
+    if model is not None:
+        return True
+    logger.info("Pipeline not loaded, attempting to load now...")
+    if not load_pipeline():
+        logger.error("Failed to load pipeline components")
+        return False
+    return True
 
 
 @app.route('/api/')
@@ -189,6 +716,7 @@ def home():
         'model_info': model_info,
         'endpoints': {
             '/api/predict': 'POST - Predict tricycle fare',
+            '/api/predict_batch': 'POST - Predict fares for a list of inputs',
             '/api/health': 'GET - Detailed health check'
         }
     })
@@ -196,9 +724,8 @@ def home():
 
 @app.before_request
 def log_request_info():
-    logger.info(f"Request Path: {request.path}")
-    logger.info(f"Request Method: {request.method}")
-    logger.info(f"Request URL: {request.url}")
+    if random.random() < REQUEST_LOG_SAMPLE_RATE:
+        logger.info("Request: %s %s", request.method, request.url)
 
 @app.route('/', methods=['GET', 'POST', 'OPTIONS'])
 def root():
@@ -210,7 +737,7 @@ def root():
 
 @app.route('/predict', methods=['POST', 'OPTIONS'])
 def predict_no_prefix():
-    logger.info("Hit /predict (no api prefix)")
+    logger.debug("Hit /predict (no api prefix)")
     return predict()
 
 @app.route('/api/predict', methods=['POST', 'OPTIONS'])
@@ -223,13 +750,10 @@ def predict():
 
     try:
         # Check if pipeline is loaded
-        if model is None:
-            logger.info("Pipeline not loaded, attempting to load now...")
-            if not load_pipeline():
-                logger.error("Failed to load pipeline components")
-                return jsonify({
-                    'error': 'Model pipeline not available. Please contact administrator.'
-                }), 500
+        if not ensure_pipeline_loaded():
+            return jsonify({
+                'error': 'Model pipeline not available. Please contact administrator.'
+            }), 500
         
         # Get JSON data from request
         if not request.is_json:
@@ -238,27 +762,24 @@ def predict():
             }), 400
         
         data = request.get_json()
-        logger.info(f"Received prediction request: {data}")
+        logger.debug("Received prediction request: %s", data)
         
         # Validate input data
         is_valid, error_message = validate_input_data(data)
         if not is_valid:
-            logger.warning(f"Validation failed: {error_message}")
+            logger.warning("Validation failed: %s", error_message)
             return jsonify({
                 'error': error_message,
                 'valid_fuel_prices': VALID_VALUES['Fuel_Price']
             }), 400
         
-        # Make prediction using the full pipeline
-        predicted_fare = prepare_and_predict(data)
+        # Make prediction using the full pipeline (cached per input tuple)
+        fare = predict_fare(data)
         
-        # Round to whole number (no decimals for tricycle fares)
-        predicted_fare = round(predicted_fare)
+        # Round to whole number (no decimals for tricycle fares), never negative
+        predicted_fare = 0 if fare < 0 else round(fare)
         
-        # Ensure non-negative fare
-        predicted_fare = max(0, predicted_fare)
-        
-        logger.info(f"Prediction successful: ₱{predicted_fare}")
+        logger.debug("Prediction successful: ₱%s", predicted_fare)
         
         return jsonify({
             'predicted_fare': predicted_fare,
@@ -273,6 +794,68 @@ def predict():
         }), 500
 
 
+@app.route('/api/predict_batch', methods=['POST', 'OPTIONS'])
+def predict_batch():
+    """
+    Predict tricycle fares for a list of inputs in a single model call
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'}), 200
+
+    try:
+        if not ensure_pipeline_loaded():
+            return jsonify({
+                'error': 'Model pipeline not available. Please contact administrator.'
+            }), 500
+        
+        if not request.is_json:
+            return jsonify({
+                'error': 'Request must be JSON'
+            }), 400
+        
+        rows = request.get_json()
+        if not isinstance(rows, list) or not rows:
+            return jsonify({
+                'error': 'Request body must be a non-empty JSON array of prediction inputs'
+            }), 400
+        if len(rows) > MAX_BULK_ROWS:
+            return jsonify({
+                'error': f"Too many rows: {len(rows)} (maximum is {MAX_BULK_ROWS})"
+            }), 400
+        
+        for index, data in enumerate(rows):
+            if not isinstance(data, dict):
+                return jsonify({'error': f"Row {index}: must be a JSON object"}), 400
+            is_valid, error_message = validate_input_data(data)
+            if not is_valid:
+                return jsonify({
+                    'error': f"Row {index}: {error_message}",
+                    'valid_fuel_prices': VALID_VALUES['Fuel_Price']
+                }), 400
+        
+        rows = [{**data, 'Distance_km': model_distance(data)} for data in rows]
+        if fare_table is not None:
+            predictions = fare_table.predict_many(rows)
+        else:
+            predictions = predict_rows(np.vstack([encoder.encode(data) for data in rows]))
+        # Clip and round the whole batch in NumPy (same rules as /predict)
+        predicted_fares = np.rint(np.maximum(predictions, 0.0)).astype(np.int64).tolist()
+        
+        logger.debug("Batch prediction successful: %d rows", len(predicted_fares))
+        
+        return jsonify({
+            'predicted_fares': predicted_fares,
+            'count': len(predicted_fares)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
+        return jsonify({
+            'error': 'Internal server error during prediction',
+            'details': str(e)
+        }), 500
+
+
 @app.route('/<path:path>', methods=['GET', 'POST', 'OPTIONS'])
 def catch_all(path):
     logger.info(f"Catch-all: {path}, Method: {request.method}")
@@ -293,8 +876,13 @@ def health():
     pipeline_status = {
         'model': 'loaded' if model is not None else 'not loaded',
         'preprocessor': 'loaded' if preprocessor is not None else 'not loaded',
-        'scaler': 'loaded' if scaler is not None else 'not loaded',
-        'metadata': 'loaded' if metadata is not None else 'not loaded'
+        'scaler': 'loaded' if scaler is not None else 'not used',
+        'encoder': 'loaded' if encoder is not None else 'not loaded',
+        'metadata': 'loaded' if metadata is not None else 'not loaded',
+        'onnx_session': 'loaded' if onnx_session is not None else 'not loaded',
+        'flat_forest': 'loaded' if flat_forest is not None else 'not loaded',
+        'fare_table': 'loaded' if fare_table is not None else 'not loaded',
+        'compiled_model': 'loaded' if compiled_model is not None else 'not loaded'
     }
     
     model_metrics = {}
@@ -307,10 +895,19 @@ def health():
             'test_samples': metadata['n_samples_test']
         }
     
+    cache_info = _cached_predict.cache_info()
+    prediction_cache = {
+        'hits': cache_info.hits,
+        'misses': cache_info.misses,
+        'size': cache_info.currsize,
+        'max_size': cache_info.maxsize
+    }
+    
     return jsonify({
         'status': 'healthy',
         'pipeline_status': pipeline_status,
         'model_metrics': model_metrics,
+        'prediction_cache': prediction_cache,
         'api_version': '2.0.0'
     }), 200
 
@@ -333,7 +930,7 @@ def not_found(error):
     return jsonify({
         'error': 'Endpoint not found',
         'message': 'Please check the API documentation',
-        'available_endpoints': ['/', '/predict', '/health', '/valid-values']
+        'available_endpoints': ['/', '/predict', '/predict_batch', '/health', '/valid-values']
     }), 404
 
 
@@ -348,17 +945,39 @@ def internal_error(error):
     }), 500
 
 
-# Pipeline will be loaded lazily on first request
+def _reload_onnx_session_after_fork():
+    """
+    onnxruntime sessions are not fork-safe, so each forked worker
+    builds its own session instead of inheriting the master's
+    """
+    global onnx_session, onnx_input_name
+    if onnx_session is not None:
+        onnx_session = load_onnx_session(ONNX_PATH, model, encoder)
+        onnx_input_name = onnx_session.get_inputs()[0].name if onnx_session is not None else None
+        warm_up(model, encoder, fare_table, compiled_model, onnx_session, flat_forest)
+
+
+os.register_at_fork(after_in_child=_reload_onnx_session_after_fork)
+
+# Load the pipeline at import time so that gunicorn's preload_app loads it once
+# in the master and forked workers share the model pages copy-on-write.
+# Requests still retry the load lazily if this fails.
+load_pipeline()
+
+# ASGI entry point: uvicorn index:asgi_app --workers N
+# WsgiToAsgi runs each request in a worker thread, so the event loop never
+# blocks on inference (which itself runs on the batching thread).
+asgi_app = WsgiToAsgi(app) if WsgiToAsgi is not None else None
 
 # Application entry point
 if __name__ == '__main__':
     logger.info("Starting Tagum Tricycle Fare Optimizer API...")
     logger.info(f"Model R² Score: {metadata['r2']:.4f}" if metadata else "Model not loaded")
     
-    # Run the Flask app
+    # Run the Flask development server (use gunicorn.conf.py in production)
     app.run(
         host='0.0.0.0',
         port=5001,
-        debug=True  # Set to False in production
+        debug=False
     )
 